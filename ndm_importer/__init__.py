@@ -0,0 +1,100 @@
+"""Blender add-on for importing .NDM models and their .DTX textures."""
+
+bl_info = {
+    'name': '.NDM Importer',
+    'author': 'ExtCan',
+    'version': (0, 1, 0),
+    'blender': (3, 0, 0),
+    'location': 'File > Import > NDM Model (.ndm)',
+    'description': 'Import .NDM models with their .DTX textures',
+    'category': 'Import-Export',
+}
+
+try:
+    import bpy
+except ImportError:  # running outside Blender (e.g. list_meshes)
+    bpy = None
+
+from .ndm_parser import NDMParser
+
+if bpy is not None:
+    import os
+    from concurrent.futures import ThreadPoolExecutor
+
+    from bpy.props import (BoolProperty, CollectionProperty, FloatProperty,
+                           StringProperty)
+    from bpy_extras.io_utils import ImportHelper
+
+    from . import mesh_builder
+
+    class ImportNDM(bpy.types.Operator, ImportHelper):
+        """Import one or more .NDM model files"""
+
+        bl_idname = 'import_scene.ndm'
+        bl_label = 'Import NDM'
+        bl_options = {'REGISTER', 'UNDO'}
+
+        filename_ext = '.ndm'
+        filter_glob: StringProperty(default='*.ndm;*.NDM', options={'HIDDEN'})
+        files: CollectionProperty(type=bpy.types.OperatorFileListElement)
+        directory: StringProperty(subtype='DIR_PATH')
+        scale_factor: FloatProperty(
+            name='Scale', description='Scale applied to all geometry',
+            default=0.1, min=0.0001, max=100.0)
+        merge: BoolProperty(
+            name='Merge meshes',
+            description='Combine all mesh nodes of a file into one object',
+            default=False)
+
+        def execute(self, context):
+            paths = [os.path.join(self.directory, f.name)
+                     for f in self.files]
+            # Parse on worker threads so file N+1 is read and decoded
+            # while file N is built; bpy calls stay on this thread.
+            # One image cache spans every file of the batch so shared
+            # .DTX textures load once, and each parse completion kicks
+            # off decode jobs for that file's textures so they overlap
+            # with mesh building.
+            image_cache = {}
+            texture_cache = {}
+            dir_indices = {}
+            with ThreadPoolExecutor() as pool:
+                def prefetch(future):
+                    try:
+                        parser = future.result()
+                    except Exception:
+                        return  # reported when the build loop hits it
+                    mesh_builder.prefetch_textures(
+                        parser, pool, texture_cache, dir_indices)
+
+                futures = [pool.submit(lambda p: NDMParser(p).read(), path)
+                           for path in paths]
+                for future in futures:
+                    future.add_done_callback(prefetch)
+                for path, future in zip(paths, futures):
+                    try:
+                        parser = future.result()
+                        try:
+                            mesh_builder.build_from_parser(
+                                context, parser,
+                                self.scale_factor, self.merge,
+                                image_cache=image_cache,
+                                texture_cache=texture_cache)
+                        finally:
+                            parser.close()
+                    except Exception as exc:
+                        self.report({'ERROR'},
+                                    'Failed to import %s: %s' % (path, exc))
+                        return {'CANCELLED'}
+            return {'FINISHED'}
+
+    def menu_func_import(self, context):
+        self.layout.operator(ImportNDM.bl_idname, text='NDM Model (.ndm)')
+
+    def register():
+        bpy.utils.register_class(ImportNDM)
+        bpy.types.TOPBAR_MT_file_import.append(menu_func_import)
+
+    def unregister():
+        bpy.types.TOPBAR_MT_file_import.remove(menu_func_import)
+        bpy.utils.unregister_class(ImportNDM)
@@ -0,0 +1,361 @@
+"""Loader for .DTX texture files.
+
+A DTX file stores one GameCube-style GX texture:
+
+    0x00    u16     GX texture format (0=I4, 1=I8, 2=IA4, 3=IA8,
+                    4=RGB565, 5=RGB5A3, 6=RGBA8)
+    0x02    u8      log2(width)
+    0x03    u8      log2(height)
+    0x04    u32     pixel data size
+    0x08    u8      mip level count
+    0x20            pixel data
+
+Pixel data is tiled the way the GX texture unit expects: 4x4-pixel
+tiles for 16-bit formats, 8x4 for 8-bit, 8x8 for 4-bit, row-major
+within each tile.
+"""
+
+import mmap
+import os
+import struct
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+try:
+    import bpy
+except ImportError:  # parsing outside Blender
+    bpy = None
+
+TEX_FORMAT_I4 = 0
+TEX_FORMAT_I8 = 1
+TEX_FORMAT_IA4 = 2
+TEX_FORMAT_IA8 = 3
+TEX_FORMAT_RGB565 = 4
+TEX_FORMAT_RGB5A3 = 5
+TEX_FORMAT_RGBA8 = 6
+
+DATA_OFFSET = 0x20
+
+
+class DTXTexture:
+    """One decoded texture: format id, dimensions, and RGBA pixels."""
+
+    __slots__ = ('format', 'width', 'height', 'pixels')
+
+    def __init__(self, tex_format, width, height, pixels):
+        self.format = tex_format
+        self.width = width
+        self.height = height
+        self.pixels = pixels
+
+    def __repr__(self):
+        return 'DTXTexture(format=%d, %dx%d)' % (self.format, self.width,
+                                                 self.height)
+
+
+def parse_dtx_header(data):
+    """Read the header; returns (format, width, height, data_size, mips)."""
+    if len(data) < DATA_OFFSET:
+        raise ValueError('file too small to be a DTX')
+    tex_format, log2_w, log2_h = struct.unpack_from('>HBB', data, 0)
+    data_size = struct.unpack_from('>I', data, 4)[0]
+    mip_count = data[8]
+    width = 1 << log2_w
+    height = 1 << log2_h
+    if not (0 < width <= 1024 and 0 < height <= 1024):
+        # Header looks damaged; guess square-ish dimensions from the
+        # stored data size.  Dimensions are always powers of two, so
+        # the level-0 pixel count is the largest power of two in the
+        # size (a mip chain only adds another third on top), and a
+        # near-square split is two bit shifts rather than a search
+        # over candidate sizes.
+        bpp = _bits_per_pixel(tex_format)
+        pixel_count = data_size * 8 // bpp if bpp else 0
+        if pixel_count <= 0:
+            raise ValueError('cannot determine DTX dimensions')
+        k = pixel_count.bit_length() - 1
+        width = 1 << ((k + 1) // 2)
+        height = 1 << (k // 2)
+        if not (width <= 1024 and height <= 1024):
+            raise ValueError('cannot determine DTX dimensions')
+    return tex_format, width, height, data_size, mip_count
+
+
+def _bits_per_pixel(tex_format):
+    if tex_format == TEX_FORMAT_I4:
+        return 4
+    if tex_format in (TEX_FORMAT_I8, TEX_FORMAT_IA4):
+        return 8
+    if tex_format == TEX_FORMAT_IA8:
+        return 16
+    if tex_format == TEX_FORMAT_RGBA8:
+        return 32
+    return 16
+
+
+def _padded(width, height, tile_w, tile_h):
+    """Dimensions rounded up to whole tiles; GX stores full tiles."""
+    return (-(-width // tile_w) * tile_w, -(-height // tile_h) * tile_h)
+
+
+def _untile(vals, width, height, tile_w, tile_h):
+    """Reorder GX-tiled values (one per pixel) into a (H, W) array."""
+    pw, ph = _padded(width, height, tile_w, tile_h)
+    tiles_y = ph // tile_h
+    tiles_x = pw // tile_w
+    return (vals[:pw * ph]
+            .reshape(tiles_y, tiles_x, tile_h, tile_w)
+            .transpose(0, 2, 1, 3)
+            .reshape(ph, pw)[:height, :width])
+
+
+def _fill_rgb5a3(buf, count, out):
+    for i in range(count):
+        # The int() casts keep the uncompiled fallback on Python ints;
+        # shifting the raw uint8 elements would wrap at 8 bits.  Under
+        # numba they compile away.
+        s = DATA_OFFSET + i * 2
+        v = (int(buf[s]) << 8) | int(buf[s + 1])
+        o = i * 4
+        if v & 0x8000:  # RGB555, opaque
+            out[o] = ((v >> 10) & 0x1F) << 3
+            out[o + 1] = ((v >> 5) & 0x1F) << 3
+            out[o + 2] = (v & 0x1F) << 3
+            out[o + 3] = 255
+        else:  # ARGB3444
+            out[o] = ((v >> 8) & 0xF) << 4
+            out[o + 1] = ((v >> 4) & 0xF) << 4
+            out[o + 2] = (v & 0xF) << 4
+            out[o + 3] = ((v >> 12) & 0x7) << 5
+
+
+def _fill_i8(buf, count, out):
+    for i in range(count):
+        v = buf[DATA_OFFSET + i]
+        o = i * 4
+        out[o] = v
+        out[o + 1] = v
+        out[o + 2] = v
+        out[o + 3] = 255
+
+
+def _fill_ia4(buf, count, out):
+    for i in range(count):
+        v = buf[DATA_OFFSET + i]
+        o = i * 4
+        intensity = (v & 0xF) * 17
+        out[o] = intensity
+        out[o + 1] = intensity
+        out[o + 2] = intensity
+        out[o + 3] = (v >> 4) * 17
+
+
+def _fill_i4(buf, count, out):
+    for i in range(count // 2):
+        v = buf[DATA_OFFSET + i]
+        o = i * 8
+        hi = (v >> 4) * 17
+        lo = (v & 0xF) * 17
+        out[o] = hi
+        out[o + 1] = hi
+        out[o + 2] = hi
+        out[o + 3] = 255
+        out[o + 4] = lo
+        out[o + 5] = lo
+        out[o + 6] = lo
+        out[o + 7] = 255
+
+
+def _fill_ia8(buf, count, out):
+    for i in range(count):
+        v = buf[DATA_OFFSET + i * 2 + 1]
+        o = i * 4
+        out[o] = v
+        out[o + 1] = v
+        out[o + 2] = v
+        out[o + 3] = buf[DATA_OFFSET + i * 2]
+
+
+def _fill_rgba8(buf, count, out):
+    # RGBA8 tiles store AR pairs for the whole 4x4 tile, then GB pairs.
+    for t in range(count // 16):
+        base = DATA_OFFSET + t * 64
+        o = t * 64
+        for p in range(16):
+            out[o] = buf[base + p * 2 + 1]
+            out[o + 1] = buf[base + 32 + p * 2]
+            out[o + 2] = buf[base + 32 + p * 2 + 1]
+            out[o + 3] = buf[base + p * 2]
+            o += 4
+
+
+if njit is not None:
+    # The fill loops above are written to compile as-is; uncompiled
+    # they stay the fallback when numba is absent.
+    _jit = njit(cache=True, nogil=True)
+    _fill_rgb5a3 = _jit(_fill_rgb5a3)
+    _fill_i8 = _jit(_fill_i8)
+    _fill_ia4 = _jit(_fill_ia4)
+    _fill_i4 = _jit(_fill_i4)
+    _fill_ia8 = _jit(_fill_ia8)
+    _fill_rgba8 = _jit(_fill_rgba8)
+    del _jit
+
+
+def _fill_and_untile(fill, data, width, height, tile_w, tile_h, bpp):
+    """Run a per-pixel fill over the padded area, then untile it."""
+    pw, ph = _padded(width, height, tile_w, tile_h)
+    count = pw * ph
+    # The fill kernels run without bounds checks (njit elides them), so
+    # a header claiming more pixels than the file holds must be caught
+    # here rather than read past the end of the mapping.
+    if len(data) < DATA_OFFSET + count * bpp // 8:
+        raise ValueError('DTX pixel data truncated')
+    flat = np.empty(count * 4, np.uint8)
+    fill(np.frombuffer(data, np.uint8), count, flat)
+    flat = flat.reshape(-1, 4)
+    out = np.empty((height, width, 4), np.uint8)
+    for c in range(4):
+        out[..., c] = _untile(flat[:, c], width, height, tile_w, tile_h)
+    return out
+
+
+# (format, width, height) -> shape-bound decoder.  Texture sets reuse a
+# handful of shapes (256x256 RGB565 above all), so after the first load
+# of a shape the dispatch is one dict hit with no format branching.
+_decode_cache = {}
+
+
+def decode_dtx_pixels(data, tex_format, width, height):
+    """Decode tiled pixel data into an (H, W, 4) uint8 RGBA array."""
+    key = (tex_format, width, height)
+    decode = _decode_cache.get(key)
+    if decode is None:
+        base = _DECODERS.get(tex_format)
+        if base is None:
+            raise ValueError('unsupported DTX format %d' % tex_format)
+
+        def decode(data, _base=base, _w=width, _h=height):
+            return _base(data, _w, _h)
+
+        _decode_cache[key] = decode
+    return decode(data)
+
+
+def _decode_rgb565(data, width, height):
+    """Vectorized RGB565: one frombuffer pass plus bitwise unpacking."""
+    pw, ph = _padded(width, height, 4, 4)
+    vals = np.frombuffer(data, dtype='>u2', count=pw * ph,
+                         offset=DATA_OFFSET)
+    vals = _untile(vals, width, height, 4, 4)
+    rgba = np.empty((height, width, 4), np.uint8)
+    rgba[..., 0] = ((vals >> 11) & 0x1F).astype(np.uint8) << 3
+    rgba[..., 1] = ((vals >> 5) & 0x3F).astype(np.uint8) << 2
+    rgba[..., 2] = (vals & 0x1F).astype(np.uint8) << 3
+    rgba[..., 3] = 255
+    return rgba
+
+
+def _decode_rgb5a3(data, width, height):
+    return _fill_and_untile(_fill_rgb5a3, data, width, height, 4, 4, 16)
+
+
+def _decode_i8(data, width, height):
+    return _fill_and_untile(_fill_i8, data, width, height, 8, 4, 8)
+
+
+def _decode_ia4(data, width, height):
+    return _fill_and_untile(_fill_ia4, data, width, height, 8, 4, 8)
+
+
+def _decode_i4(data, width, height):
+    return _fill_and_untile(_fill_i4, data, width, height, 8, 8, 4)
+
+
+def _decode_ia8(data, width, height):
+    return _fill_and_untile(_fill_ia8, data, width, height, 4, 4, 16)
+
+
+def _decode_rgba8(data, width, height):
+    return _fill_and_untile(_fill_rgba8, data, width, height, 4, 4, 32)
+
+
+_DECODERS = {
+    TEX_FORMAT_I4: _decode_i4,
+    TEX_FORMAT_I8: _decode_i8,
+    TEX_FORMAT_IA4: _decode_ia4,
+    TEX_FORMAT_IA8: _decode_ia8,
+    TEX_FORMAT_RGB565: _decode_rgb565,
+    TEX_FORMAT_RGB5A3: _decode_rgb5a3,
+    TEX_FORMAT_RGBA8: _decode_rgba8,
+}
+
+
+def load_dtx(filepath):
+    """Read and decode one .DTX file into a DTXTexture.
+
+    The file is mapped rather than read, so the vectorized decoders
+    pull pixel data straight from the page cache; every decoder
+    returns an owned RGBA array, so the mapping is released on exit.
+    """
+    with open(filepath, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            raise ValueError('file too small to be a DTX')
+        try:
+            header = parse_dtx_header(mm)
+            tex_format, width, height = header[:3]
+            pixels = decode_dtx_pixels(mm, tex_format, width, height)
+        finally:
+            try:
+                mm.close()
+            except BufferError:
+                # A decoder that raised can leave traceback frames
+                # holding frombuffer views of the mapping; letting
+                # close() raise here would mask the real error.  The
+                # mapping is released when those frames are dropped.
+                pass
+    return DTXTexture(tex_format, width, height, pixels)
+
+
+def index_directory(directory):
+    """Map upper-cased texture names to .DTX paths in one scandir pass."""
+    index = {}
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                stem, ext = os.path.splitext(entry.name)
+                if ext.upper() == '.DTX':
+                    index[stem.upper()] = entry.path
+    except OSError:
+        pass
+    return index
+
+
+def find_dtx_file(directory, name, index=None):
+    """Locate the .DTX file for a texture name, case-insensitively.
+
+    Pass a precomputed ``index_directory`` result to resolve many
+    names against one directory without re-listing it per call.
+    """
+    if index is None:
+        index = index_directory(directory)
+    return index.get(name.upper())
+
+
+def create_blender_image(name, texture):
+    """Create a bpy Image from a decoded DTXTexture."""
+    image = bpy.data.images.new(name, width=texture.width,
+                                height=texture.height, alpha=True)
+    arr = texture.pixels.astype(np.float32, copy=False) * (1.0 / 255.0)
+    # Blender stores rows bottom-up; flip the decoded image vertically.
+    arr = np.flipud(arr)
+    image.pixels.foreach_set(np.ascontiguousarray(arr).ravel())
+    image.pack()
+    return image
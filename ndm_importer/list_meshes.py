@@ -0,0 +1,35 @@
+"""List the nodes of one or more .NDM files.
+
+Usage: python -m ndm_importer.list_meshes FILE.NDM [FILE.NDM ...]
+"""
+
+import sys
+
+from .ndm_parser import NDMParser
+
+
+def list_meshes(filepath):
+    with NDMParser(filepath).read() as parser:
+        print('%s: %d textures, %d nodes' % (
+            filepath, len(parser.textures), len(parser.nodes)))
+        for node in parser.nodes:
+            if node.has_mesh:
+                faces, _ = parser.get_mesh_faces_and_uvs(node)
+                print('  %-16s %6d verts %6d tris' % (node.name,
+                                                      node.vertex_count,
+                                                      len(faces)))
+            else:
+                print('  %-16s (no mesh)' % node.name)
+
+
+def main(argv):
+    if not argv:
+        print(__doc__.strip())
+        return 1
+    for filepath in argv:
+        list_meshes(filepath)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,300 @@
+"""Builds Blender meshes and objects from parsed NDM data."""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import bpy
+import numpy as np
+
+from . import dtx_loader
+from .ndm_parser import NDMParser
+
+
+def import_ndm(context, filepath, scale_factor=0.1, merge=False):
+    """Import one .NDM file into the current collection."""
+    return build_from_parser(context, NDMParser(filepath).read(),
+                             scale_factor, merge)
+
+
+def build_from_parser(context, parser, scale_factor=0.1, merge=False,
+                      image_cache=None, texture_cache=None):
+    """Build Blender objects from an already-read parser.
+
+    Split from import_ndm so callers can parse several files off the
+    main thread and feed the results here serially.  ``image_cache``
+    maps resolved .DTX paths to loaded images; passing the same dict
+    for several files deduplicates texture IO across all of them.
+    ``texture_cache`` maps paths to in-flight prefetch futures from
+    prefetch_textures.
+    """
+    if image_cache is None:
+        image_cache = {}
+    filepath = parser.filepath
+    mesh_nodes = [node for node in parser.nodes if node.has_mesh]
+    parsed = parse_mesh_nodes(parser, mesh_nodes, scale_factor)
+    collection = context.collection
+    if merge:
+        positions = np.array([node.position for node in mesh_nodes],
+                             dtype=np.float32).reshape(-1, 3)
+        positions *= scale_factor
+        obj = merge_meshes(
+            parsed, os.path.splitext(os.path.basename(filepath))[0],
+            positions)
+        if obj is not None:
+            collection.objects.link(obj)
+            context.view_layer.objects.active = obj
+        return parser
+
+    created_objects = {}
+    name_counts = {}
+    materials = {}
+    directory = os.path.dirname(filepath)
+    dtx_index = dtx_loader.index_directory(directory)
+    objects_new = bpy.data.objects.new
+    # Column-major view of the node transforms: scaling every location
+    # in one multiply beats a Vector() construction per object.
+    locations = np.array([node.position for node in mesh_nodes],
+                         dtype=np.float32).reshape(-1, 3)
+    locations *= scale_factor
+    for i, (node, (vertices, faces, uv_faces, uvs)) in enumerate(
+            zip(mesh_nodes, parsed)):
+        if not len(vertices) or not len(faces):
+            continue
+        # Match Blender's own ".%03d" scheme so its unique-name rename
+        # pass has nothing to do for duplicated node names.
+        suffix = name_counts.get(node.name, 0)
+        name_counts[node.name] = suffix + 1
+        mesh_name = node.name if suffix == 0 \
+            else '%s.%03d' % (node.name, suffix)
+        mesh = create_mesh_data(mesh_name, vertices, faces)
+        assign_uvs(mesh, uvs, uv_faces)
+        assign_vertex_colors(mesh, node.color1, node.color2)
+        material = material_for_node(parser, node, dtx_index, materials,
+                                     image_cache, texture_cache)
+        if material is not None:
+            mesh.materials.append(material)
+        obj = objects_new(mesh_name, mesh)
+        obj.location = locations[i]
+        created_objects[mesh_name] = obj
+    if created_objects:
+        # Linking last keeps the depsgraph update notifications out of
+        # the mesh-building loop; they all coalesce into one view-layer
+        # evaluation after the operator finishes.
+        link = collection.objects.link
+        for obj in created_objects.values():
+            link(obj)
+        context.view_layer.objects.active = \
+            next(iter(created_objects.values()))
+    return parser
+
+
+def prefetch_textures(parser, pool, texture_cache, dir_indices):
+    """Queue decode jobs for the textures a parsed file will sample.
+
+    Safe to call from a parse worker's done-callback: it only touches
+    the filesystem and the shared caches, never bpy.  By the time the
+    main thread builds materials for this file, load_dtx_image finds
+    the decodes finished (or in flight) in ``texture_cache``.
+
+    Only textures a mesh node actually references are queued; texture
+    tables routinely list entries no node samples, and decoding those
+    would be pure waste.
+    """
+    directory = os.path.dirname(parser.filepath)
+    index = dir_indices.get(directory)
+    if index is None:
+        index = dir_indices.setdefault(
+            directory, dtx_loader.index_directory(directory))
+    num_textures = len(parser.textures)
+    for node in parser.nodes:
+        if not (node.has_mesh and node.texture_indices):
+            continue
+        tex_index = node.texture_indices[0]
+        if tex_index >= num_textures:
+            continue
+        path = index.get(parser.textures[tex_index].upper())
+        if path is not None and path not in texture_cache:
+            texture_cache.setdefault(
+                path, pool.submit(dtx_loader.load_dtx, path))
+
+
+def material_for_node(parser, node, dtx_index, materials, image_cache,
+                      texture_cache=None):
+    """Return (creating on first use) the material for a node's texture.
+
+    Each NDM node references textures by index into the file's texture
+    table; the node's first texture drives its material.  Materials are
+    shared per texture name via the caller-owned cache dict, so every
+    node using the same .DTX gets the same material datablock.
+    """
+    if not node.texture_indices:
+        return None
+    index = node.texture_indices[0]
+    if index >= len(parser.textures):
+        return None
+    tex_name = parser.textures[index]
+    if tex_name in materials:
+        return materials[tex_name]
+    material = create_material(tex_name, dtx_index, image_cache,
+                               texture_cache)
+    materials[tex_name] = material
+    return material
+
+
+def create_material(tex_name, dtx_index, image_cache, texture_cache=None):
+    """Create a principled material textured with the named .DTX file."""
+    material = bpy.data.materials.new(tex_name)
+    material.use_nodes = True
+    path = dtx_index.get(tex_name.upper())
+    if path is None:
+        return material
+    image = load_dtx_image(tex_name, path, image_cache, texture_cache)
+    if image is None:
+        return material
+    tree = material.node_tree
+    tex_node = tree.nodes.new('ShaderNodeTexImage')
+    tex_node.image = image
+    bsdf = tree.nodes['Principled BSDF']
+    tree.links.new(tex_node.outputs['Color'], bsdf.inputs['Base Color'])
+    tree.links.new(tex_node.outputs['Alpha'], bsdf.inputs['Alpha'])
+    return material
+
+
+def load_dtx_image(tex_name, path, image_cache, texture_cache=None):
+    """Load, decode, and cache the image for one resolved .DTX path.
+
+    Different files referencing the same texture share a cache entry,
+    so each .DTX is read and decoded at most once per import.  When a
+    prefetch future exists for the path, its result is consumed
+    instead of decoding inline.
+    """
+    if path in image_cache:
+        return image_cache[path]
+    try:
+        if texture_cache is not None and path in texture_cache:
+            texture = texture_cache[path].result()
+        else:
+            texture = dtx_loader.load_dtx(path)
+    except (OSError, ValueError):
+        image = None
+    else:
+        image = dtx_loader.create_blender_image(tex_name, texture)
+    image_cache[path] = image
+    return image
+
+
+def parse_mesh_nodes(parser, mesh_nodes, scale_factor=1.0):
+    """Decode every mesh node's geometry before any bpy calls.
+
+    The decode methods only read parser.data, so they are safe to run
+    off the main thread; Blender API work stays on the caller's thread.
+    The import scale is fused into the fixed-point vertex conversion so
+    the positions are materialised as float32 exactly once. Returns a
+    list of (vertices, faces, uv_faces, uvs) per node.
+    """
+    def decode(node):
+        faces, uv_faces = parser.get_mesh_faces_and_uvs(node)
+        return (parser.get_mesh_vertices(node, scale_factor), faces,
+                uv_faces, parser.get_mesh_uvs(node))
+
+    # Spinning up the pool costs more than decoding a handful of small
+    # nodes; stay serial below that.
+    if len(mesh_nodes) < 4:
+        return [decode(node) for node in mesh_nodes]
+    with ThreadPoolExecutor() as pool:
+        return list(pool.map(decode, mesh_nodes))
+
+
+def merge_meshes(parsed, name, positions=None):
+    """Combine every parsed (pre-scaled) mesh node into one object.
+
+    ``positions`` holds each node's scaled location, aligned with
+    ``parsed``.  A single object cannot carry per-node locations the
+    way the non-merge path does, so the offsets are baked into the
+    vertices while accumulating.
+    """
+    all_vertices = []
+    all_uvs = []
+    all_faces = []
+    all_uv_faces = []
+    vertex_offset = 0
+    uv_offset = 0
+    for i, (vertices, faces, uv_faces, uvs) in enumerate(parsed):
+        if not len(vertices) or not len(faces):
+            continue
+        # Accumulate per-node arrays and concatenate once at the end;
+        # growing one flat list of tuples costs far more memory.
+        if positions is not None:
+            vertices = vertices + positions[i]
+        all_vertices.append(vertices)
+        all_uvs.append(uvs)
+        all_faces.append(faces + vertex_offset)
+        all_uv_faces.append(uv_faces + uv_offset)
+        vertex_offset += len(vertices)
+        uv_offset += len(uvs)
+    if not all_vertices:
+        return None
+    verts_np = np.concatenate(all_vertices)
+    mesh = create_mesh_data(name, verts_np, np.concatenate(all_faces))
+    assign_uvs(mesh, np.concatenate(all_uvs), np.concatenate(all_uv_faces))
+    return bpy.data.objects.new(name, mesh)
+
+
+def create_mesh_data(name, verts, faces):
+    """Create a triangle mesh from (N, 3) float32 / (M, 3) int32 arrays.
+
+    Bypasses from_pydata, which iterates its arguments in Python, and
+    fills the vertex/loop/polygon arrays with bulk foreach_set writes.
+    """
+    mesh = bpy.data.meshes.new(name)
+    num_faces = len(faces)
+    mesh.vertices.add(len(verts))
+    mesh.vertices.foreach_set('co', verts.ravel())
+    mesh.loops.add(num_faces * 3)
+    mesh.loops.foreach_set('vertex_index', faces.ravel())
+    mesh.polygons.add(num_faces)
+    mesh.polygons.foreach_set(
+        'loop_start', np.arange(0, num_faces * 3, 3, dtype=np.int32))
+    mesh.polygons.foreach_set(
+        'loop_total', np.full(num_faces, 3, dtype=np.int32))
+    # Display-list geometry is authored for per-vertex lit hardware, so
+    # faceted default shading misrepresents it; smooth everything in
+    # one bulk write.
+    mesh.polygons.foreach_set('use_smooth', np.ones(num_faces, dtype=bool))
+    mesh.update(calc_edges=True)
+    # No validate() pass: the parser already rejects out-of-range and
+    # degenerate indices, and Blender's embedded Python runs with
+    # __debug__ on, so gating the O(faces) topology walk on it never
+    # actually skipped it.
+    return mesh
+
+
+def assign_uvs(mesh, uvs, uv_faces):
+    if not len(uvs):
+        return
+    uv_layer = mesh.uv_layers.new(name='UVMap')
+    # The parser hands over float32/int32 arrays; asarray is a no-op
+    # pass-through kept for callers with plain sequences.
+    uvs_np = np.asarray(uvs, dtype=np.float32)
+    uv_faces_np = np.asarray(uv_faces, dtype=np.int32)
+    # Out-of-range UV references fall back to the first UV rather than
+    # leaving the loop untouched, as the per-loop path used to do.  The
+    # range check runs once over the whole array, never per loop.
+    if uv_faces_np.size and int(uv_faces_np.max()) >= len(uvs_np):
+        uv_faces_np = np.where(uv_faces_np < len(uvs_np), uv_faces_np, 0)
+    uv_layer.data.foreach_set('uv', uvs_np[uv_faces_np].ravel())
+
+
+def assign_vertex_colors(mesh, color1, color2=None):
+    """Fill color layers from the node's two flat colors.
+
+    NDM colors are per node, not per vertex, so each layer is one
+    broadcast into a float32 buffer and a single foreach_set write.
+    """
+    n = len(mesh.loops)
+    buf = np.empty(n * 4, dtype=np.float32)
+    buf.reshape(n, 4)[:] = color1
+    mesh.vertex_colors.new(name='Col').data.foreach_set('color', buf)
+    if color2 is not None and color2 != color1:
+        buf.reshape(n, 4)[:] = color2
+        mesh.vertex_colors.new(name='Col2').data.foreach_set('color', buf)
@@ -0,0 +1,778 @@
+"""Parser for .NDM model files.
+
+An NDM file bundles the scene graph and geometry for one stage or prop.
+The layout, as far as it is understood, is:
+
+    0x00    u32     texture count T
+    0x08    u16     hierarchy entry count N
+    0x20    T*16    texture names, 16-byte NUL-padded fields
+    ...     N*3     hierarchy entries (type u8, parent lo u8, parent hi u8);
+                    parenting only -- there is no skinning data, so every
+                    vertex follows its node rigidly
+    ...             node records, 16-byte aligned
+
+Node record (0x60-byte header, everything big-endian):
+
+    +0x00   char[16]  name, NUL padded
+    +0x10   f32[3]    position
+    +0x28   f32[3]    scale
+    +0x34   u32       flags
+    +0x38   u8[4]     primary colour (RGBA)
+    +0x3C   u8[4]     secondary colour (RGBA)
+    +0x40   u16[8]    texture indices, 0xFFFF when unused
+    +0x50   u32       mesh data size (0x20 for mesh-less nodes)
+    +0x54   u32       display-list header size
+    +0x58   u32       display-list size
+
+A mesh node carries, after the header: a 0x20-byte mesh block header,
+packed int16 vertex positions, u16 UV pairs, and a GX-style display
+list (0x80 quads, 0x90 triangles, 0x98 triangle strips, 0xA0 triangle
+fans) whose entries reference positions/UVs by index.  No per-vertex
+normals and no morph targets are stored anywhere in the file; shading
+relies on the normals Blender derives from the imported topology, and
+each node has exactly one rest-pose mesh.
+
+The header section does not contain a trustworthy node offset table,
+so nodes are located by scanning for plausible 16-byte-aligned name
+regions and validating the record that follows.
+"""
+
+import mmap
+import re
+import struct
+import sys
+import threading
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+NODE_HEADER_SIZE = 0x60
+MESH_HEADER_SIZE = 0x20
+DRAW_COMMANDS = (0x80, 0x90, 0x98, 0xA0)
+
+# Every fixed field of a standard node header in one compiled layout, so
+# the common case is a single unpack_from call instead of ~15.
+_NODE_STRUCT = struct.Struct('>16s 3f 12x 3f I 4B 4B 8H 3I')
+
+# Compiled scalar/vector layouts for the hot unpack call sites.
+_U16_BE = struct.Struct('>H')
+_U32_BE = struct.Struct('>I')
+_3H_BE = struct.Struct('>3h')
+_3I_BE = struct.Struct('>3I')
+_2H_BE = struct.Struct('>2H')
+_I16_BE = struct.Struct('>h')
+_F32_BE = struct.Struct('>f')
+_3F_BE = struct.Struct('>3f')
+
+# f32 bit patterns of the 1e-4 .. 1e4 scale-magnitude window used by
+# the node validator.
+_SCALE_BITS_LO = 0x38D1B717  # 1e-4
+_SCALE_BITS_HI = 0x461C4000  # 1e4
+
+# Bytes-level mirror of is_valid_name: identifier characters only, with
+# at least one alphanumeric.  Lets the validator test raw name bytes
+# without decoding them to str first.
+_NAME_BYTES_RE = re.compile(rb'[_.\-]*[A-Za-z0-9][A-Za-z0-9_.\-]*\Z')
+
+# Translate tables used by the node scan: a name region is printable
+# ASCII padded with NULs, so map those to 0 and everything else to 1.
+# The stricter table marks only printable bytes, for the first character.
+_INVALID_TRANS = bytes(0 if (32 <= i < 127 or i == 0) else 1
+                       for i in range(256))
+_NONPRINT_TRANS = bytes(0 if 32 <= i < 127 else 1 for i in range(256))
+
+# Marks draw-command bytes so the display-list walk can jump between
+# them with bytes.find instead of stepping one byte at a time.
+_DRAW_MARK = bytes(1 if i in DRAW_COMMANDS else 0 for i in range(256))
+
+# Byte-to-float table so colour decoding is four lookups per channel
+# set instead of a genexpr with a division per channel.
+_U8_TO_F32 = tuple(i / 255.0 for i in range(256))
+
+
+_decode_display_list_jit = None
+_scan_candidates_jit = None
+if njit is not None:
+    @njit(cache=True, nogil=True)
+    def _scan_candidates_jit(buf, start):
+        """Native mirror of the candidate prefilter in _find_and_parse_nodes.
+
+        Must accept exactly the same offsets as the vectorized NumPy
+        path: 16-byte-aligned positions whose first byte is printable
+        ASCII and whose full 16-byte name window is printable-or-NUL.
+        """
+        n = len(buf)
+        out = np.empty((n - start) // 16 + 1, np.int64)
+        w = 0
+        for off in range(start, n - 15, 16):
+            b0 = buf[off]
+            if b0 < 32 or b0 >= 127:
+                continue
+            ok = True
+            for i in range(1, 16):
+                b = buf[off + i]
+                if b != 0 and (b < 32 or b >= 127):
+                    ok = False
+                    break
+            if ok:
+                out[w] = off
+                w += 1
+        return out[:w]
+
+    @njit(cache=True, nogil=True)
+    def _decode_display_list_jit(buf, dl_offset, dl_end, num_vertices, bpv):
+        """Native mirror of the display-list walk in get_mesh_faces_and_uvs.
+
+        Emits the same triangles, in the same order, as the NumPy
+        fallback path; keep the two in sync.
+        """
+        max_tris = max((dl_end - dl_offset) // bpv + 4, 4)
+        faces = np.empty((max_tris, 3), np.int32)
+        uv_faces = np.empty((max_tris, 3), np.int32)
+        pos = np.empty(0x1000, np.int32)
+        uv = np.empty(0x1000, np.int32)
+        w = 0
+        offset = dl_offset
+        while offset + 3 <= dl_end:
+            cmd = buf[offset]
+            if cmd == 0x80 or cmd == 0x90 or cmd == 0x98 or cmd == 0xA0:
+                count = (buf[offset + 1] << 8) | buf[offset + 2]
+                if count == 0 or count > 0x1000:
+                    offset += 1
+                    continue
+                idx_offset = offset + 3
+                avail = (dl_end - idx_offset) // bpv
+                c = count if count < avail else avail
+                m = 0
+                for i in range(c):
+                    off = idx_offset + i * bpv
+                    if bpv == 6:
+                        p = (buf[off] << 8) | buf[off + 1]
+                        u = (buf[off + 4] << 8) | buf[off + 5]
+                    else:
+                        p = buf[off]
+                        u = buf[off + 2]
+                    if p >= num_vertices:
+                        break
+                    pos[m] = p
+                    uv[m] = u
+                    m += 1
+                if cmd == 0x90:
+                    for i in range(0, m - m % 3, 3):
+                        a, b, c2 = pos[i], pos[i + 1], pos[i + 2]
+                        if a != b and b != c2 and a != c2:
+                            faces[w, 0] = a
+                            faces[w, 1] = b
+                            faces[w, 2] = c2
+                            uv_faces[w, 0] = uv[i]
+                            uv_faces[w, 1] = uv[i + 1]
+                            uv_faces[w, 2] = uv[i + 2]
+                            w += 1
+                elif cmd == 0x80:
+                    mq = m - m % 4
+                    for i in range(0, mq, 4):
+                        a, b, c2 = pos[i], pos[i + 1], pos[i + 2]
+                        if a != b and b != c2 and a != c2:
+                            faces[w, 0] = a
+                            faces[w, 1] = b
+                            faces[w, 2] = c2
+                            uv_faces[w, 0] = uv[i]
+                            uv_faces[w, 1] = uv[i + 1]
+                            uv_faces[w, 2] = uv[i + 2]
+                            w += 1
+                    for i in range(0, mq, 4):
+                        a, b, c2 = pos[i], pos[i + 2], pos[i + 3]
+                        if a != b and b != c2 and a != c2:
+                            faces[w, 0] = a
+                            faces[w, 1] = b
+                            faces[w, 2] = c2
+                            uv_faces[w, 0] = uv[i]
+                            uv_faces[w, 1] = uv[i + 2]
+                            uv_faces[w, 2] = uv[i + 3]
+                            w += 1
+                elif cmd == 0x98:
+                    for i in range(m - 2):
+                        a, b, c2 = pos[i], pos[i + 1], pos[i + 2]
+                        ub, uc = uv[i + 1], uv[i + 2]
+                        if i & 1:
+                            b, c2 = c2, b
+                            ub, uc = uc, ub
+                        if a != b and b != c2 and a != c2:
+                            faces[w, 0] = a
+                            faces[w, 1] = b
+                            faces[w, 2] = c2
+                            uv_faces[w, 0] = uv[i]
+                            uv_faces[w, 1] = ub
+                            uv_faces[w, 2] = uc
+                            w += 1
+                else:  # 0xA0 fan
+                    for i in range(1, m - 1):
+                        a, b, c2 = pos[0], pos[i], pos[i + 1]
+                        if a != b and b != c2 and a != c2:
+                            faces[w, 0] = a
+                            faces[w, 1] = b
+                            faces[w, 2] = c2
+                            uv_faces[w, 0] = uv[0]
+                            uv_faces[w, 1] = uv[i]
+                            uv_faces[w, 2] = uv[i + 1]
+                            w += 1
+                offset = idx_offset + count * bpv
+            else:
+                offset += 1
+        return faces[:w].copy(), uv_faces[:w].copy()
+
+
+def read_uint8(data, offset):
+    return data[offset]
+
+
+def read_uint16_be(data, offset):
+    return _U16_BE.unpack_from(data, offset)[0]
+
+
+def read_int16_be(data, offset):
+    return _I16_BE.unpack_from(data, offset)[0]
+
+
+def read_uint32_be(data, offset):
+    return _U32_BE.unpack_from(data, offset)[0]
+
+
+def read_float_be(data, offset):
+    return _F32_BE.unpack_from(data, offset)[0]
+
+
+def read_string(data, offset, max_length=16):
+    """Read a NUL-terminated ASCII string of at most max_length bytes.
+
+    The result is interned: node and texture names repeat heavily
+    within and across files, so duplicates collapse to one object and
+    downstream name-keyed dict lookups hit the pointer-equality fast
+    path.
+    """
+    end = data.find(b'\x00', offset, offset + max_length)
+    if end < 0:
+        end = min(offset + max_length, len(data))
+    return sys.intern(data[offset:end].decode('ascii', 'replace').strip())
+
+
+_NAME_ALNUM = frozenset(
+    'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789')
+_NAME_CHARS = _NAME_ALNUM | frozenset('_.-')
+
+
+def is_valid_name(name):
+    """True when name looks like a node/texture identifier."""
+    if not name:
+        return False
+    chars = set(name)
+    return chars <= _NAME_CHARS and not chars.isdisjoint(_NAME_ALNUM)
+
+
+class NDMNode:
+    """A single node record: transform, colours, and optional mesh info."""
+
+    __slots__ = ('name', 'offset', 'parent_index', 'node_type', 'position',
+                 'scale', 'flags', 'color1', 'color2', 'texture_indices',
+                 'has_mesh', 'mesh_data_offset', 'vertex_data_size',
+                 'dl_header_size', 'display_list_size', 'position_data_size',
+                 'uv_data_offset', 'vertex_count')
+
+    def __init__(self, name='', offset=0):
+        self.name = name
+        self.offset = offset
+        self.parent_index = -1
+        self.node_type = 0
+        self.position = (0.0, 0.0, 0.0)
+        self.scale = (1.0, 1.0, 1.0)
+        self.flags = 0
+        self.color1 = (1.0, 1.0, 1.0, 1.0)
+        self.color2 = (1.0, 1.0, 1.0, 1.0)
+        self.texture_indices = ()
+        self.has_mesh = False
+        self.mesh_data_offset = 0
+        self.vertex_data_size = 0
+        self.dl_header_size = 0
+        self.display_list_size = 0
+        self.position_data_size = 0
+        self.uv_data_offset = 0
+        self.vertex_count = 0
+
+    def __repr__(self):
+        return 'NDMNode(%r, verts=%d)' % (self.name, self.vertex_count)
+
+
+class NDMParser:
+    """Reads one .NDM file and exposes its nodes and mesh data."""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.data = b''
+        self._file = None
+        self._mv = memoryview(b'')
+        self._u8 = np.empty(0, dtype=np.uint8)
+        self._scratch = threading.local()
+        self.textures = []
+        self.hierarchy = np.empty((0, 3), np.int32)
+        self.nodes = []
+
+    def read(self):
+        self._file = open(self.filepath, 'rb')
+        try:
+            # Map rather than copy: the OS pages the file in on demand
+            # and slicing/frombuffer work on the mapping unchanged.
+            self.data = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        except ValueError:  # zero-length file
+            self.data = b''
+        # A memoryview skips the per-call buffer re-validation that
+        # struct.unpack_from does on bytes, and makes single-field loads
+        # plain integer indexing.
+        self._mv = memoryview(self.data)
+        self._u8 = np.frombuffer(self._mv, dtype=np.uint8)
+        self._parse_header()
+        self._find_and_parse_nodes()
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Release the mapping and the underlying file."""
+        self._u8 = np.empty(0, dtype=np.uint8)
+        self._mv.release()
+        self._mv = memoryview(b'')
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.data = b''
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # -- header -----------------------------------------------------------
+
+    def _parse_header(self):
+        if len(self.data) < 0x20:
+            raise ValueError('file too small to be an NDM: %s' % self.filepath)
+        data = self.data
+        dlen = len(data)
+        num_textures = _U32_BE.unpack_from(data, 0x00)[0]
+        num_entries = _U16_BE.unpack_from(data, 0x08)[0]
+        offset = 0x20
+        for _ in range(num_textures):
+            if offset + 16 > dlen:
+                break
+            name = read_string(data, offset, 16)
+            self.textures.append(name)
+            offset += 16
+        num_entries = min(num_entries, max((dlen - offset) // 3, 0))
+        raw = np.frombuffer(self._mv, dtype=np.uint8,
+                            count=num_entries * 3,
+                            offset=offset).reshape(-1, 3).astype(np.int32)
+        # Rows are (type, parent, index) like the old tuple list; the
+        # 0xFFFF no-parent marker becomes -1.
+        table = np.empty((num_entries, 3), np.int32)
+        table[:, 0] = raw[:, 0]
+        table[:, 1] = raw[:, 1] | (raw[:, 2] << 8)
+        table[table[:, 1] == 0xFFFF, 1] = -1
+        table[:, 2] = np.arange(num_entries)
+        self.hierarchy = table
+        offset += num_entries * 3
+        self._node_search_start = (offset + 15) & ~15
+
+    # -- node discovery ---------------------------------------------------
+
+    def _find_and_parse_nodes(self):
+        search_start = self._node_search_start
+        dlen = len(self.data)
+        if search_start >= dlen:
+            return
+        # Prefilter: a node record starts with a printable, NUL-padded
+        # name, so only 16-byte-aligned offsets whose first 8 bytes are
+        # printable-or-NUL (and whose first byte is printable) can
+        # qualify.  One translate pass plus a windowed sum over the whole
+        # file prunes candidates before the Python loop runs.
+        if _scan_candidates_jit is not None:
+            candidates = _scan_candidates_jit(self._u8, search_start)
+        else:
+            # One vectorized sweep: every aligned offset whose 16-byte
+            # name window is printable-or-NUL (first byte printable).
+            invalid = np.frombuffer(
+                self.data[search_start:].translate(_INVALID_TRANS),
+                dtype=np.uint8)
+            if len(invalid) < 16:
+                return
+            aligned = np.lib.stride_tricks.sliding_window_view(
+                invalid, 16)[::16]
+            run_ok = ~aligned.any(axis=1)
+            first = self._u8[search_start::16][:len(run_ok)]
+            run_ok &= (first >= 32) & (first < 127)
+            candidates = np.flatnonzero(run_ok) * 16 + search_start
+
+        # Candidates are sorted, so after accepting a node every offset
+        # inside its data can be skipped with one binary search instead
+        # of testing each candidate against next_offset.
+        num_candidates = len(candidates)
+        data = self.data
+        is_valid = self._is_valid_node_at
+        parse_at = self._parse_node_at
+        peek_sizes = _3I_BE.unpack_from
+        append_node = self.nodes.append
+        i = 0
+        while i < num_candidates:
+            offset = int(candidates[i])
+            i += 1
+            if not is_valid(offset, dlen):
+                continue
+            # Peek only the three size words first; candidates that a
+            # full parse would reject anyway skip the header decode.
+            sizes = peek_sizes(data, offset + 0x50)
+            if sizes[0] < MESH_HEADER_SIZE:
+                continue
+            if offset + NODE_HEADER_SIZE + sum(sizes) > dlen:
+                continue
+            node = parse_at(offset)
+            if node is None:
+                continue
+            append_node(node)
+            next_offset = (offset + NODE_HEADER_SIZE + node.vertex_data_size
+                           + node.dl_header_size + node.display_list_size)
+            next_offset = (next_offset + 15) & ~15
+            i = int(np.searchsorted(candidates, next_offset))
+
+    def _is_valid_node_at(self, offset, dlen=None):
+        if dlen is None:
+            dlen = len(self.data)
+        if offset + NODE_HEADER_SIZE > dlen:
+            return False
+        name_bytes = self.data[offset:offset + 16]
+        # One translate pass replaces the per-byte range checks: every
+        # byte must be printable-or-NUL, the field must not start with
+        # NUL, and nothing may follow the terminator.
+        if 1 in name_bytes.translate(_INVALID_TRANS):
+            return False
+        nul = name_bytes.find(0)
+        if nul == 0:
+            return False
+        if nul == -1:
+            nul = 16
+        elif name_bytes[nul:].lstrip(b'\x00'):
+            return False
+        if _NAME_BYTES_RE.fullmatch(name_bytes, 0, nul) is None:
+            return False
+        # The scale floats are the cheapest structural check: a real node
+        # always stores small, finite, non-zero values there.  IEEE
+        # float bit patterns of one sign order like their magnitudes, so
+        # comparing the absolute bits against the window bounds needs no
+        # float conversion and rejects NaN/Inf for free (their patterns
+        # sort above every finite value).
+        for bits in _3I_BE.unpack_from(self.data, offset + 0x28):
+            if not (_SCALE_BITS_LO < bits & 0x7FFFFFFF < _SCALE_BITS_HI):
+                return False
+        return True
+
+    def _parse_node_at(self, offset):
+        data = self.data
+        try:
+            fields = _NODE_STRUCT.unpack_from(data, offset)
+        except struct.error:
+            return self._parse_node_at_generic(offset)
+        name = fields[0].split(b'\x00', 1)[0].decode('ascii',
+                                                     'replace').strip()
+        node = NDMNode(name, offset)
+        node.position = fields[1:4]
+        node.scale = fields[4:7]
+        node.flags = fields[7]
+        lut = _U8_TO_F32
+        node.color1 = (lut[fields[8]], lut[fields[9]], lut[fields[10]],
+                       lut[fields[11]])
+        node.color2 = (lut[fields[12]], lut[fields[13]], lut[fields[14]],
+                       lut[fields[15]])
+        node.texture_indices = tuple(t for t in fields[16:24] if t != 0xFFFF)
+        node.vertex_data_size = fields[24]
+        node.dl_header_size = fields[25]
+        node.display_list_size = fields[26]
+        return self._finish_node(node, offset)
+
+    def _parse_node_at_generic(self, offset):
+        """Fallback for records the packed layout cannot reach.
+
+        Decodes the whole 0x60-byte header through two ndarray views (one
+        u32 word pass, reinterpreted as f32 where needed) instead of one
+        struct call per field.
+        """
+        data = self.data
+        if offset + NODE_HEADER_SIZE > len(data):
+            return None
+        name = read_string(data, offset, 16)
+        node = NDMNode(name, offset)
+        words = np.frombuffer(self._mv, dtype='>u4', count=24, offset=offset)
+        floats = words.view('>f4')
+        node.position = (float(floats[4]), float(floats[5]),
+                         float(floats[6]))
+        node.scale = (float(floats[10]), float(floats[11]),
+                      float(floats[12]))
+        node.flags = int(words[13])
+        colors = self._u8[offset + 0x38:offset + 0x40] / np.float32(255.0)
+        node.color1 = tuple(float(c) for c in colors[:4])
+        node.color2 = tuple(float(c) for c in colors[4:])
+        tex = np.frombuffer(self._mv, dtype='>u2', count=8,
+                            offset=offset + 0x40)
+        node.texture_indices = tuple(int(t) for t in tex if t != 0xFFFF)
+        node.vertex_data_size = int(words[20])
+        node.dl_header_size = int(words[21])
+        node.display_list_size = int(words[22])
+        return self._finish_node(node, offset)
+
+    def _finish_node(self, node, offset):
+        data = self.data
+        if node.vertex_data_size < MESH_HEADER_SIZE:
+            return None
+        end = (offset + NODE_HEADER_SIZE + node.vertex_data_size
+               + node.dl_header_size + node.display_list_size)
+        if end > len(data):
+            return None
+        node.mesh_data_offset = offset + NODE_HEADER_SIZE
+        if (node.vertex_data_size > MESH_HEADER_SIZE
+                and node.display_list_size > 0):
+            mesh = node.mesh_data_offset
+            node.position_data_size = _U32_BE.unpack_from(data, mesh + 0x14)[0]
+            node.uv_data_offset = _U32_BE.unpack_from(data, mesh + 0x18)[0]
+            node.vertex_count = node.position_data_size // 6
+            payload = node.vertex_data_size - MESH_HEADER_SIZE
+            if node.position_data_size <= payload:
+                node.has_mesh = node.vertex_count > 0
+        return node
+
+    # -- mesh data --------------------------------------------------------
+
+    def get_mesh_vertices_raw(self, node):
+        """A node's positions as a raw big-endian int16 (N, 3) view.
+
+        Stays in fixed point so analysis passes touch a quarter of the
+        float bandwidth; positions are 8.8 fixed point (divide by 256).
+        """
+        base = node.mesh_data_offset + MESH_HEADER_SIZE
+        count = min(node.vertex_count, max((len(self.data) - base) // 6, 0))
+        return np.frombuffer(self._mv, dtype='>i2', count=count * 3,
+                             offset=base).reshape(-1, 3)
+
+    def get_mesh_vertices(self, node, scale=1.0):
+        """Decode a node's positions into a float32 (N, 3) array.
+
+        Any caller-side scale is fused into the fixed-point conversion
+        so the floats are only written once.
+        """
+        raw = self.get_mesh_vertices_raw(node)
+        return raw.astype(np.float32) * np.float32(scale / 256.0)
+
+    def get_mesh_uvs(self, node):
+        """Decode a node's u16 UV pairs into an (N, 2) float32 array."""
+        base = node.mesh_data_offset + MESH_HEADER_SIZE + node.uv_data_offset
+        end = node.mesh_data_offset + node.vertex_data_size
+        count = max((end - base) // 4, 0)
+        count = min(count, max((len(self.data) - base) // 4, 0))
+        raw = np.frombuffer(self._mv, dtype='>u2', count=count * 2,
+                            offset=base).reshape(-1, 2)
+        uvs = raw.astype(np.float32)
+        uvs *= np.float32(1.0 / 256.0)
+        # The V axis is stored top-down; Blender's UV origin is bottom-left.
+        uvs[:, 1] *= np.float32(-1.0)
+        uvs[:, 1] += np.float32(1.0)
+        return uvs
+
+    def get_mesh_faces_and_uvs(self, node):
+        """Walk a node's display list and emit triangle index lists.
+
+        Returns (faces, uv_faces) as int32 arrays of shape (M, 3) indexing
+        the node's vertex/UV arrays.
+        """
+        faces = []
+        uv_faces = []
+        dl_offset = (node.mesh_data_offset + node.vertex_data_size
+                     + node.dl_header_size)
+        dl_end = min(dl_offset + node.display_list_size, len(self.data))
+        bytes_per_vertex = self._detect_vertex_ref_format(
+            node, dl_offset, dl_end)
+        if _decode_display_list_jit is not None:
+            return _decode_display_list_jit(
+                self._u8, dl_offset, dl_end,
+                node.vertex_count, bytes_per_vertex)
+        # Bind the reference decoder once per mesh so the format branch
+        # does not repeat for every draw command.
+        parse_refs = (self._parse_refs_wide if bytes_per_vertex == 6
+                      else self._parse_refs_narrow)
+        dl = self.data[dl_offset:dl_end]
+        find_mark = dl.translate(_DRAW_MARK).find
+        emit = self._emit_faces
+        vertex_count = node.vertex_count
+        n = len(dl)
+        rel = 0
+        while rel + 3 <= n:
+            cmd = dl[rel]
+            if cmd in DRAW_COMMANDS:
+                count = (dl[rel + 1] << 8) | dl[rel + 2]
+                if count == 0 or count > 0x1000:
+                    rel = find_mark(1, rel + 1)
+                    if rel < 0:
+                        break
+                    continue
+                idx_offset = dl_offset + rel + 3
+                indices, uv_indices = parse_refs(
+                    idx_offset, count, bytes_per_vertex, vertex_count,
+                    dl_end)
+                emit(cmd, indices, uv_indices, faces, uv_faces)
+                rel += 3 + count * bytes_per_vertex
+            else:
+                # memchr-style jump straight to the next draw byte.
+                rel = find_mark(1, rel + 1)
+                if rel < 0:
+                    break
+        if not faces:
+            empty = np.empty((0, 3), dtype=np.int32)
+            return empty, empty
+        return np.concatenate(faces), np.concatenate(uv_faces)
+
+    def _emit_faces(self, cmd, idx, uvx, faces, uv_faces):
+        n = len(idx)
+        if n < 3:
+            return
+        if cmd == 0x90:  # triangles
+            tris = idx[:n - n % 3].reshape(-1, 3)
+            uv_tris = uvx[:n - n % 3].reshape(-1, 3)
+        elif cmd == 0x80:  # quads, split along 0-2
+            if n < 4:
+                return
+            m = n - n % 4
+            q = idx[:m].reshape(-1, 4)
+            uq = uvx[:m].reshape(-1, 4)
+            tris = np.concatenate([q[:, [0, 1, 2]], q[:, [0, 2, 3]]])
+            uv_tris = np.concatenate([uq[:, [0, 1, 2]], uq[:, [0, 2, 3]]])
+        elif cmd == 0x98:  # triangle strip
+            tris = np.ascontiguousarray(
+                np.lib.stride_tricks.sliding_window_view(idx, 3))
+            uv_tris = np.ascontiguousarray(
+                np.lib.stride_tricks.sliding_window_view(uvx, 3))
+            # Every other strip triangle flips winding.
+            tris[1::2] = tris[1::2][:, [0, 2, 1]]
+            uv_tris[1::2] = uv_tris[1::2][:, [0, 2, 1]]
+        elif cmd == 0xA0:  # triangle fan
+            v1 = idx[1:-1]
+            v2 = idx[2:]
+            tris = np.stack([np.full_like(v1, idx[0]), v1, v2], axis=1)
+            uv_tris = np.stack(
+                [np.full_like(v1, uvx[0]), uvx[1:-1], uvx[2:]], axis=1)
+        else:
+            return
+        # Branchless degeneracy test: a pair is equal exactly when its
+        # XOR is zero.  (AND-ing the three XORs together would be wrong:
+        # their set bits can cancel for perfectly valid triangles.)
+        mask = (((tris[:, 0] ^ tris[:, 1]) != 0)
+                & ((tris[:, 1] ^ tris[:, 2]) != 0)
+                & ((tris[:, 0] ^ tris[:, 2]) != 0))
+        faces.append(tris[mask])
+        uv_faces.append(uv_tris[mask])
+
+    def _parse_vertex_indices(self, offset, count, bytes_per_vertex,
+                              num_vertices, dl_end):
+        """Decode count vertex references, stopping at the first bad index."""
+        if bytes_per_vertex == 6:
+            return self._parse_refs_wide(offset, count, bytes_per_vertex,
+                                         num_vertices, dl_end)
+        return self._parse_refs_narrow(offset, count, bytes_per_vertex,
+                                       num_vertices, dl_end)
+
+    def _ref_block(self, offset, count, bytes_per_vertex, dl_end):
+        count = min(count, max((dl_end - offset) // bytes_per_vertex, 0))
+        if count == 0:
+            return None
+        end = offset + count * bytes_per_vertex
+        return self._u8[offset:end].reshape(count, bytes_per_vertex)
+
+    def _scratch_pair(self, count):
+        """Reusable int32 scratch for decoded references.
+
+        Thread-local because parse_mesh_nodes decodes nodes in parallel;
+        callers consume the views before the next draw command reuses
+        the buffers.
+        """
+        loc = self._scratch
+        bufs = getattr(loc, 'bufs', None)
+        if bufs is None or len(bufs[0]) < count:
+            size = max(count, 0x1000)
+            bufs = (np.empty(size, dtype=np.int32),
+                    np.empty(size, dtype=np.int32))
+            loc.bufs = bufs
+        return bufs[0][:count], bufs[1][:count]
+
+    def _parse_refs_wide(self, offset, count, bytes_per_vertex,
+                         num_vertices, dl_end):
+        """Specialized decoder for 6-byte (u16 index) references."""
+        block = self._ref_block(offset, count, bytes_per_vertex, dl_end)
+        if block is None:
+            return (np.empty(0, dtype=np.int32),) * 2
+        pos, uv = self._scratch_pair(len(block))
+        np.copyto(pos, block[:, 0], casting='unsafe')
+        pos <<= 8
+        pos |= block[:, 1]
+        np.copyto(uv, block[:, 4], casting='unsafe')
+        uv <<= 8
+        uv |= block[:, 5]
+        return self._trim_bad_refs(pos, uv, num_vertices)
+
+    def _parse_refs_narrow(self, offset, count, bytes_per_vertex,
+                           num_vertices, dl_end):
+        """Specialized decoder for 3- and 4-byte (u8 index) references."""
+        block = self._ref_block(offset, count, bytes_per_vertex, dl_end)
+        if block is None:
+            return (np.empty(0, dtype=np.int32),) * 2
+        pos, uv = self._scratch_pair(len(block))
+        np.copyto(pos, block[:, 0], casting='unsafe')
+        np.copyto(uv, block[:, 2], casting='unsafe')
+        return self._trim_bad_refs(pos, uv, num_vertices)
+
+    @staticmethod
+    def _trim_bad_refs(pos, uv, num_vertices):
+        valid = pos < num_vertices
+        if not valid.all():
+            first_bad = int(np.argmin(valid))
+            pos = pos[:first_bad]
+            uv = uv[:first_bad]
+        return pos, uv
+
+    def _detect_vertex_ref_format(self, node, dl_offset, dl_end):
+        """Guess how many bytes one display-list vertex reference takes.
+
+        Small meshes use byte indices (3 bytes per reference); meshes with
+        more than 256 positions need u16 indices (6 bytes).  Validate the
+        guess against the first draw command: every position index must be
+        in range and the command must end on another command or padding.
+        """
+        if dl_offset + 3 > dl_end:
+            return 3
+        mv = self._mv
+        cmd = mv[dl_offset]
+        if cmd not in DRAW_COMMANDS:
+            return 3 if node.vertex_count <= 256 else 6
+        count = (mv[dl_offset + 1] << 8) | mv[dl_offset + 2]
+        if count == 0:
+            return 3 if node.vertex_count <= 256 else 6
+        for bpv in (3, 4, 6) if node.vertex_count <= 256 else (6, 3, 4):
+            end = dl_offset + 3 + count * bpv
+            if end > dl_end:
+                continue
+            indices, _ = self._parse_vertex_indices(
+                dl_offset + 3, count, bpv, node.vertex_count, dl_end)
+            if len(indices) != count:
+                continue
+            if end == dl_end or mv[end] in DRAW_COMMANDS \
+                    or mv[end] == 0:
+                return bpv
+        return 3 if node.vertex_count <= 256 else 6